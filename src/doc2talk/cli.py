@@ -4,6 +4,8 @@ DocTalk CLI - Terminal interface for the doc2talk library
 
 import argparse
 import asyncio
+import time
+from typing import Optional
 
 from rich.console import Console
 from rich.live import Live
@@ -16,11 +18,15 @@ from .core import ChatEngine, ChatSession, SessionManager
 HAIR_SPACE = "\u200a"  # Thinnest space
 THIN_SPACE = "\u2009"  # A bit thicker
 SIX_PER_EM_SPACE = "\u2006"  # Slightly thicker
+REFRESH_PER_SECOND = 10  # Live redraws of a streaming response
+
+# Shared console so terminal capabilities are probed once per process
+_CONSOLE = Console()
 
 
 class ChatCLI:
-    def __init__(self):
-        self.console = Console()
+    def __init__(self, console: Optional[Console] = None):
+        self.console = console or _CONSOLE
         # Track terminal width and listen for changes
         self.width = self.console.width
         self.console.set_window_title("DocTalk - Code Chat")
@@ -46,12 +52,20 @@ class ChatCLI:
         await engine.update_context(session, question, decision)
 
         # Now stream the response
-        with Live(Markdown(""), refresh_per_second=10) as live:
+        with Live(
+            Markdown(""), console=self.console, refresh_per_second=REFRESH_PER_SECOND
+        ) as live:
             full_response = []
+            last_update = 0.0
             async for chunk in engine.generate_response_stream(session, question):
                 full_response.append(chunk)
-                # Update the live display with latest markdown
-                live.update(Markdown("".join(full_response)))
+                # Re-render the markdown at most once per refresh instead of
+                # once per token; Live can't draw faster than that anyway
+                now = time.monotonic()
+                if now - last_update >= 1 / REFRESH_PER_SECOND:
+                    live.update(Markdown("".join(full_response)))
+                    last_update = now
+            live.update(Markdown("".join(full_response)))
 
         # Display context status
         status = session.context_manager.get_status()
@@ -7,6 +7,7 @@ import json
 import time
 import uuid
 import warnings
+import weakref
 from datetime import datetime
 from pathlib import Path
 from typing import AsyncGenerator, Dict, List, Optional
@@ -25,6 +26,14 @@ SESSION_DIR = HOME_DIR / "sessions"
 DEFAULT_MAX_HISTORY = 50  # Default number of messages to keep
 DEFAULT_MAX_CONTEXTS = 5  # Default number of contexts to keep
 
+# Knowledge graphs already loaded in this process, keyed by cache file, so
+# engines over the same sources share one graph while any of them is alive
+_GRAPHS: "weakref.WeakValueDictionary[str, DocGraph]" = weakref.WeakValueDictionary()
+
+# Summaries of saved session files by path, with the (mtime_ns, size) they
+# were read at
+_SESSION_SUMMARIES: Dict[Path, tuple] = {}
+
 
 # --- Core Classes ---
 class ChatSession:
@@ -58,16 +67,18 @@ class SessionManager:
     def save(session: ChatSession):
         SESSION_DIR.mkdir(parents=True, exist_ok=True)
         path = SESSION_DIR / f"{session.session_id}.json"
+        # json.dumps() encodes in one pass with the C encoder; json.dump()
+        # streams through the pure-Python one with a write per fragment
+        data = json.dumps(
+            {
+                "id": session.session_id,
+                "messages": session.messages,
+                "contexts": session.context_manager.context_history,
+                "created": datetime.now().isoformat(),
+            }
+        )
         with open(path, "w") as f:
-            json.dump(
-                {
-                    "id": session.session_id,
-                    "messages": session.messages,
-                    "contexts": session.context_manager.context_history,
-                    "created": datetime.now().isoformat(),
-                },
-                f,
-            )
+            f.write(data)
 
     @staticmethod
     def load(session_id: str, max_history: int = DEFAULT_MAX_HISTORY, 
@@ -104,15 +115,23 @@ class SessionManager:
         sessions = []
         for f in SESSION_DIR.glob("*.json"):
             try:
-                with open(f) as file:
-                    data = json.load(file)
-                    sessions.append(
+                # Session files hold whole conversations and contexts; only
+                # re-read the ones that changed since they were last listed
+                st = f.stat()
+                key = (st.st_mtime_ns, st.st_size)
+                cached = _SESSION_SUMMARIES.get(f)
+                if cached is None or cached[0] != key:
+                    with open(f) as file:
+                        data = json.load(file)
+                    cached = _SESSION_SUMMARIES[f] = (
+                        key,
                         {
                             "id": data["id"],
                             "created": data.get("created", ""),
                             "message_count": len(data["messages"]),
-                        }
+                        },
                     )
+                sessions.append(dict(cached[1]))
             except:  # noqa: E722
                 continue
 
@@ -121,6 +140,7 @@ class SessionManager:
     @staticmethod
     def delete_session(session_id: str) -> bool:
         path = SESSION_DIR / f"{session_id}.json"
+        _SESSION_SUMMARIES.pop(path, None)
         if path.exists():
             path.unlink()
             return True
@@ -252,13 +272,23 @@ class ChatEngine:
 
         cache_path = self.CACHE_DIR / f"{repo_id}.c4ai"
 
-        if cache_path.exists() and not force_rebuild:
-            print(f"Loading knowledge graph from cache ({cache_path.name})...")
-            start_time = time.process_time()
-            self.knowledge_assistant = DocGraph.load(cache_path)
-            load_time = time.process_time() - start_time
-            print(f"Knowledge graph loaded in {load_time:.2f}s")
-        else:
+        # A forced rebuild builds a new graph and replaces the shared entry,
+        # never touching the instance other engines may be querying
+        self.knowledge_assistant = None
+        if not force_rebuild:
+            self.knowledge_assistant = _GRAPHS.get(str(cache_path))
+            if self.knowledge_assistant is None and cache_path.exists():
+                print(f"Loading knowledge graph from cache ({cache_path.name})...")
+                start_time = time.process_time()
+                try:
+                    self.knowledge_assistant = DocGraph.load(cache_path)
+                    load_time = time.process_time() - start_time
+                    print(f"Knowledge graph loaded in {load_time:.2f}s")
+                except Exception as e:
+                    # Stale or unreadable cache, rebuild it below
+                    print(f"Ignoring cached knowledge graph: {e}")
+
+        if self.knowledge_assistant is None:
             print(
                 f"Building knowledge graph for:\n- Code: {self.code_source}\n- Docs: {self.docs_source}"  # noqa: E501
             )
@@ -274,6 +304,8 @@ class ChatEngine:
             self.knowledge_assistant.persist(cache_path)
             print(f"Knowledge graph cached at {cache_path}")
 
+        _GRAPHS[str(cache_path)] = self.knowledge_assistant
+
         # Store LLM configs
         self.decision_llm_config = decision_llm_config
         self.generation_llm_config = generation_llm_config
@@ -6,7 +6,8 @@ import asyncio
 from pathlib import Path
 from typing import AsyncGenerator, Dict, List, Optional, Union
 
-from .core import ChatEngine, ChatSession, SessionManager
+from .core import ChatEngine, ChatSession, ContextDecider, SessionManager
+from .docgraph import DocGraph
 from .models import LLMConfig
 
 
@@ -61,6 +62,8 @@ class Doc2Talk:
         
         # Engine is lazily initialized
         self.engine = None
+        # Pending background initialization shared by concurrent async calls
+        self._engine_init = None
 
         # Initialize or load session
         if session_id:
@@ -89,6 +92,19 @@ class Doc2Talk:
         """Get the current session messages."""
         return self.session.messages
 
+    def new_session(self) -> str:
+        """
+        Start a fresh chat session, keeping the already loaded engine.
+
+        Returns:
+            The ID of the new session
+        """
+        self.session = ChatSession(
+            max_history=self._engine_params["max_history"],
+            max_contexts=self._engine_params["max_contexts"]
+        )
+        return self.session.session_id
+
     def chat(self, message: str, model: Optional[str] = None) -> str:
         """
         Send a message and get a response (non-streaming).
@@ -128,8 +144,8 @@ class Doc2Talk:
         Returns:
             The assistant's response
         """
-        # Ensure engine is initialized
-        self._ensure_engine_initialized()
+        # Ensure engine is initialized, without blocking the event loop
+        await self._ensure_engine_initialized_async()
         
         # Add user message
         self.session.add_message("user", message)
@@ -222,8 +238,8 @@ class Doc2Talk:
         Yields:
             Response chunks as they become available
         """
-        # Ensure engine is initialized
-        self._ensure_engine_initialized()
+        # Ensure engine is initialized, without blocking the event loop
+        await self._ensure_engine_initialized_async()
         
         # Add user message
         self.session.add_message("user", message)
@@ -271,6 +287,17 @@ class Doc2Talk:
         if self.engine is None:
             self.build_index()
     
+    async def _ensure_engine_initialized_async(self):
+        """Ensure the engine is initialized, loading or building the index in
+        a worker thread so other coroutines keep running meanwhile."""
+        if self.engine is None:
+            loop = asyncio.get_running_loop()
+            pending = self._engine_init
+            if pending is None or pending.done() or pending.get_loop() is not loop:
+                pending = loop.run_in_executor(None, self.build_index)
+                self._engine_init = pending
+            await pending
+    
     def build_index(self, save_path: Optional[Union[str, Path]] = None) -> None:
         """
         Build the knowledge index and optionally save it.
@@ -338,15 +365,20 @@ class Doc2Talk:
         def custom_build_index(save_path=None):
             if instance.engine is None:
                 # Create engine with custom initialization
-                instance.engine = ChatEngine.__new__(ChatEngine)
-                instance.engine.CACHE_DIR = Path.home() / ".doctalk" / "index"
+                engine = ChatEngine.__new__(ChatEngine)
+                engine.CACHE_DIR = Path.home() / ".doctalk" / "index"
                 
                 # Load from the index file
-                engine_class = type(instance.engine)
-                instance.engine.knowledge_assistant = engine_class.knowledge_assistant.load(instance._index_path)
+                engine.knowledge_assistant = DocGraph.load(instance._index_path)
+                engine.code_source = getattr(engine.knowledge_assistant, "code_root", None)
+                engine.docs_source = getattr(engine.knowledge_assistant, "docs_root", None)
+                engine.exclude_patterns = engine.knowledge_assistant.exclude or []
                 
                 # Setup other engine attributes needed
-                instance.engine.decider = engine_class.decider.__new__(engine_class.decider)
+                engine.decision_llm_config = decision_llm_config
+                engine.generation_llm_config = generation_llm_config
+                engine.decider = ContextDecider(llm_config=decision_llm_config)
+                instance.engine = engine
             
             # Handle saving if requested
             if save_path:
@@ -1,21 +1,48 @@
 import ast
 import fnmatch
-import hashlib
 import mmap
+import multiprocessing
+import os
 import re
 import shutil
 import struct
 import subprocess
+import tempfile
+import threading
 import time
 from abc import ABC, abstractmethod
-from collections import defaultdict
+from collections import Counter, defaultdict, deque
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
 from math import log
 from pathlib import Path
 
 import msgpack
+import numpy as np
+import xxhash
 import zstandard as zstd
 
 
+_TOKEN_RE = re.compile(r"\b\w+\b")
+_GH_URL_RE = re.compile(r"^(https?://github\.com/|git@github\.com:)")
+_GH_PARSE_RE = re.compile(
+    r"github\.com[:/](?P<user>[^/]+)/(?P<repo>[^/]+)"
+    r"(/tree/(?P<branch>[^/]+))?(?P<path>/.+)?"
+)
+_NEWLINE_RE = re.compile(rb"\r\n?|\n")
+_MMAP_MIN_BYTES = 10 * 1024 * 1024  # Larger files are read through mmap
+_IOV_MAX = 1024  # Buffers per writev() call (Linux limit)
+
+# Mode of files written through mkstemp() (which creates them 0600), matching
+# what open() would give them. The umask can only be read by setting it, so
+# this happens once at import rather than per write
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+_FILE_MODE = 0o666 & ~_UMASK
+
+
 class ResourcePathResolver(ABC):
     @abstractmethod
     def validate(self, path: str = None) -> bool:
@@ -40,6 +67,11 @@ class GitHubResolver(ResourcePathResolver):
     # Define constants
     REPOS_DIR = Path.home() / ".doctalk" / "repos"
     MAX_REPO_AGE_DAYS = 30  # Auto cleanup repos older than this
+    MAX_CACHE_BYTES = 5 * 1024**3  # Evict least recently used repos above this
+    INDEX_FILE = REPOS_DIR / "repos.index"  # {repo_dir: [last_access, size]}
+    REFRESH_INTERVAL = 10 * 60  # Seconds before a cached repo is fetched again
+    # Protocol v2 and parallel transfer settings for every git invocation
+    GIT_CONFIG = ("protocol.version=2", "http.maxRequests=16", "pack.threads=8")
 
     def __init__(self):
         self.temp_dirs = []
@@ -48,22 +80,25 @@ class GitHubResolver(ResourcePathResolver):
         # Create cache directory if it doesn't exist
         self.REPOS_DIR.mkdir(parents=True, exist_ok=True)
 
-        # Perform cleanup of old repos on init (if needed)
-        self._cleanup_old_repos()
+        # Old repos are cleaned up on first use rather than here, since
+        # DocGraph.RESOLVERS creates this resolver at import time
+        self._cleaned_up = False
 
     def validate(self, path: str, *args) -> bool:
         if not isinstance(path, str):
             return False
-        return bool(re.match(r"^(https?://github\.com/|git@github\.com:)", path))
+        return bool(_GH_URL_RE.match(path))
 
     def resolve(self, path: str, *args) -> Path:
+        if not self._cleaned_up:
+            self._cleaned_up = True
+            self._cleanup_old_repos()
         repo_info = self._parse_github_url(path)
         return self._fetch_repo_content(repo_info)
 
     def _parse_github_url(self, url: str) -> dict:
         """Parse GitHub URL into components"""
-        pattern = r"github\.com[:/](?P<user>[^/]+)/(?P<repo>[^/]+)(/tree/(?P<branch>[^/]+))?(?P<path>/.+)?"  # noqa: E501
-        match = re.search(pattern, url)
+        match = _GH_PARSE_RE.search(url)
         if not match:
             raise ValueError(f"Invalid GitHub URL format: {url}")
 
@@ -73,40 +108,82 @@ class GitHubResolver(ResourcePathResolver):
         info["path"] = (info["path"] or "").strip("/")
         return info
 
-    def _cleanup_old_repos(self):
-        """Clean up repositories that haven't been accessed in a long time"""
-        import time
+    def _load_index(self) -> dict:
+        """Read the repo access index, starting over if it is missing or corrupt"""
+        try:
+            return msgpack.unpackb(self.INDEX_FILE.read_bytes())
+        except Exception:
+            return {}
 
-        # Skip if disabled
-        if self.MAX_REPO_AGE_DAYS <= 0:
-            return
+    def _save_index(self, index: dict):
+        """Write the repo access index atomically"""
+        fd, tmp_file = tempfile.mkstemp(dir=self.REPOS_DIR, suffix=".tmp")
+        try:
+            with open(fd, "wb") as f:
+                f.write(msgpack.packb(index))
+            os.chmod(tmp_file, _FILE_MODE)
+            os.replace(tmp_file, self.INDEX_FILE)
+        except BaseException:
+            os.unlink(tmp_file)
+            raise
 
-        current_time = time.time()
-        cutoff_time = current_time - (self.MAX_REPO_AGE_DAYS * 24 * 60 * 60)
+    @staticmethod
+    def _dir_size(path: Path) -> int:
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, files in os.walk(path)
+            for name in files
+        )
+
+    def _cleanup_old_repos(self):
+        """Evict repositories not accessed in a long time, then least recently
+        used ones until the cache fits in MAX_CACHE_BYTES"""
+        index = self._load_index()
+        cutoff_time = time.time() - (self.MAX_REPO_AGE_DAYS * 24 * 60 * 60)
 
         # Check all repositories in cache
+        repos = []
         for repo_dir in self.REPOS_DIR.iterdir():
             if not repo_dir.is_dir():
                 continue
 
-            # Check last access time
-            access_file = repo_dir / ".last_access"
-            if not access_file.exists():
-                # No access record, use directory creation time
+            # No access record, use directory modification time
+            last_access, size = index.get(repo_dir.name) or (None, None)
+            if last_access is None:
                 last_access = repo_dir.stat().st_mtime
-            else:
-                try:
-                    last_access = float(access_file.read_text().strip())
-                except:  # noqa: E722
-                    last_access = repo_dir.stat().st_mtime
-
-            # Remove if too old
-            if last_access < cutoff_time:
-                try:
-                    shutil.rmtree(repo_dir)
-                    print(f"Cleaned up old repo: {repo_dir.name}")
-                except Exception as e:
-                    print(f"Warning: Failed to clean up old repo {repo_dir}: {e}")
+
+            # Remove if too old (skipped if disabled)
+            if self.MAX_REPO_AGE_DAYS > 0 and last_access < cutoff_time:
+                self._remove_repo(repo_dir)
+                continue
+
+            # Sizes are measured once and dropped whenever the repo changes
+            if size is None:
+                size = self._dir_size(repo_dir)
+            repos.append((last_access, size, repo_dir))
+
+        # Evict least recently used repos until under budget
+        repos.sort(key=lambda repo: repo[0])
+        total = sum(size for _, size, _ in repos)
+        while self.MAX_CACHE_BYTES > 0 and total > self.MAX_CACHE_BYTES and repos:
+            _, size, repo_dir = repos.pop(0)
+            if self._remove_repo(repo_dir):
+                total -= size
+
+        index = {repo_dir.name: [ts, size] for ts, size, repo_dir in repos}
+        try:
+            self._save_index(index)
+        except OSError as e:
+            print(f"Warning: Failed to write repo index: {e}")
+
+    def _remove_repo(self, repo_dir: Path) -> bool:
+        try:
+            shutil.rmtree(repo_dir)
+            print(f"Cleaned up old repo: {repo_dir.name}")
+            return True
+        except Exception as e:
+            print(f"Warning: Failed to clean up old repo {repo_dir}: {e}")
+            return False
 
     def _get_repo_cache_path(self, repo_info: dict) -> Path:
         """Get path to cached repository, incorporating the requested path"""
@@ -126,10 +203,49 @@ class GitHubResolver(ResourcePathResolver):
         # repo_hash = hashlib.md5(repo_name.encode()).hexdigest()[:10]
         # return self.REPOS_DIR / f"{repo_name}_{repo_hash}"
 
-    def _update_access_time(self, repo_path: Path):
-        """Update the last access time for a repository"""
-        access_file = repo_path / ".last_access"
-        access_file.write_text(str(time.time()))
+    def _update_access_time(self, repo_path: Path, changed: bool):
+        """Record the access in the repo index, outside the git working tree"""
+        index = self._load_index()
+        # A size is only re-measured by the next cleanup once git changed the
+        # repo (clone, fetch or sparse checkout)
+        _, size = index.get(repo_path.name) or (None, None)
+        index[repo_path.name] = [time.time(), None if changed else size]
+        try:
+            self._save_index(index)
+        except OSError as e:
+            print(f"Warning: Failed to write repo index: {e}")
+
+    def _is_fresh(self, repo_path: Path) -> bool:
+        """Whether the repo was cloned or fetched within REFRESH_INTERVAL"""
+        git_dir = repo_path / ".git"
+        # FETCH_HEAD is rewritten by every fetch; a fresh clone only has HEAD
+        for marker in (git_dir / "FETCH_HEAD", git_dir / "HEAD"):
+            if marker.exists():
+                age = time.time() - marker.stat().st_mtime
+                return age < self.REFRESH_INTERVAL
+        return False
+
+    def _run_git(self, *args, cwd=None):
+        """Run a git command, raising CalledProcessError on failure"""
+        cmd = ["git"]
+        for option in self.GIT_CONFIG:
+            cmd += ["-c", option]
+        cmd += args
+        # Stream stderr (progress) instead of buffering it; only the tail is
+        # kept for the error message
+        with subprocess.Popen(
+            cmd,
+            cwd=cwd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors="replace",
+        ) as proc:
+            tail = deque(proc.stderr, maxlen=20)
+        if proc.returncode:
+            raise subprocess.CalledProcessError(
+                proc.returncode, cmd, stderr="".join(tail)
+            )
 
     def _fetch_repo_content(self, repo_info: dict) -> Path:
         try:
@@ -154,72 +270,37 @@ class GitHubResolver(ResourcePathResolver):
                     f"Using cached repository: {repo_info['user']}/{repo_info['repo']} (path: {repo_info['path'] or 'root'})"  # noqa: E501
                 )
 
-                # Update the repository
-                try:
-                    subprocess.run(
-                        ["git", "pull", "origin", repo_info["branch"]],
-                        cwd=repo_cache_path,
-                        check=True,
-                        capture_output=True,
-                    )
-
-                    # If using sparse-checkout, make sure the path is in the sparse-checkout file # noqa: E501
-                    if repo_info["path"]:
-                        sparse_file = repo_cache_path / ".git/info/sparse-checkout"
-                        if sparse_file.exists():
-                            current_paths = sparse_file.read_text().strip().split("\n")
-                            if repo_info["path"] not in current_paths:
-                                sparse_file.write_text(
-                                    "\n".join(current_paths + [repo_info["path"]])
-                                )
-                                # Update checkout for new sparse-checkout paths
-                                subprocess.run(
-                                    ["git", "read-tree", "-mu", "HEAD"],
-                                    cwd=repo_cache_path,
-                                    check=True,
-                                    capture_output=True,
-                                )
-                except Exception as e:
-                    print(f"Warning: Failed to update cached repo: {e}")
+                # Update the repository, fetching only the tip commit's trees,
+                # unless it was cloned or fetched moments ago
+                fetched = False
+                if not self._is_fresh(repo_cache_path):
+                    try:
+                        self._run_git(
+                            "fetch",
+                            "--depth=1",
+                            "--filter=blob:none",
+                            "origin",
+                            repo_info["branch"],
+                            cwd=repo_cache_path,
+                        )
+                        self._run_git(
+                            "reset", "--hard", "FETCH_HEAD", cwd=repo_cache_path
+                        )
+                        fetched = True
+                    except Exception as e:
+                        print(f"Warning: Failed to update cached repo: {e}")
 
                 # Update access time
-                self._update_access_time(repo_cache_path)
+                self._update_access_time(repo_cache_path, changed=fetched)
             else:
                 # Either repo doesn't exist or the specific path doesn't exist
                 if repo_cache_path.exists() and (repo_cache_path / ".git").exists():
-                    # Repo exists but target path doesn't - update sparse checkout
+                    # Repo exists but target path doesn't - extend sparse checkout
                     print(
                         f"Updating existing repository to include: {repo_info['path']}"
                     )
-
-                    # Enable sparse checkout if not already enabled
-                    subprocess.run(
-                        ["git", "config", "core.sparseCheckout", "true"],
-                        cwd=repo_cache_path,
-                        check=True,
-                        capture_output=True,
-                    )
-
-                    # Add the new path to sparse-checkout
-                    sparse_file = repo_cache_path / ".git/info/sparse-checkout"
-                    if sparse_file.exists():
-                        current_paths = sparse_file.read_text().strip().split("\n")
-                        if repo_info["path"] not in current_paths:
-                            sparse_file.write_text(
-                                "\n".join(
-                                    [p for p in current_paths if p]
-                                    + [repo_info["path"]]
-                                )
-                            )
-                    else:
-                        sparse_file.write_text(repo_info["path"])
-
-                    # Update checkout for sparse-checkout
-                    subprocess.run(
-                        ["git", "read-tree", "-mu", "HEAD"],
-                        cwd=repo_cache_path,
-                        check=True,
-                        capture_output=True,
+                    self._run_git(
+                        "sparse-checkout", "add", repo_info["path"], cwd=repo_cache_path
                     )
                 else:
                     # Clone fresh repository
@@ -230,41 +311,41 @@ class GitHubResolver(ResourcePathResolver):
                     # Create parent directory
                     repo_cache_path.mkdir(parents=True, exist_ok=True)
 
-                    # Clone the repository
-                    subprocess.run(
-                        [
-                            "git",
-                            "clone",
-                            "--branch",
-                            repo_info["branch"],
-                            repo_url,
-                            str(repo_cache_path),
-                        ],
-                        check=True,
-                        capture_output=True,
-                    )
-
-                    # Enable sparse checkout if path is specified
+                    # Shallow, blobless clone: blobs are fetched on demand for
+                    # the files actually checked out
+                    clone_args = [
+                        "clone",
+                        "--filter=blob:none",
+                        "--depth=1",
+                        "--single-branch",
+                    ]
                     if repo_info["path"]:
-                        subprocess.run(
-                            ["git", "config", "core.sparseCheckout", "true"],
-                            cwd=repo_cache_path,
-                            check=True,
-                            capture_output=True,
+                        clone_args += ["--no-checkout", "--sparse"]
+                    clone_args += [
+                        "--branch",
+                        repo_info["branch"],
+                        repo_url,
+                        str(repo_cache_path),
+                    ]
+                    self._run_git(*clone_args)
+
+                    # Check out only the requested path (cone mode)
+                    if repo_info["path"]:
+                        self._run_git(
+                            "sparse-checkout", "init", "--cone", cwd=repo_cache_path
                         )
-                        sparse_file = repo_cache_path / ".git/info/sparse-checkout"
-                        sparse_file.write_text(repo_info["path"])
-
-                        # Update checkout for sparse-checkout
-                        subprocess.run(
-                            ["git", "read-tree", "-mu", "HEAD"],
+                        self._run_git(
+                            "sparse-checkout",
+                            "set",
+                            repo_info["path"],
                             cwd=repo_cache_path,
-                            check=True,
-                            capture_output=True,
+                        )
+                        self._run_git(
+                            "checkout", repo_info["branch"], cwd=repo_cache_path
                         )
 
                 # Update access time
-                self._update_access_time(repo_cache_path)
+                self._update_access_time(repo_cache_path, changed=True)
 
             # Verify the target path exists after all operations
             if not target_path.exists():
@@ -285,20 +366,108 @@ class GitHubResolver(ResourcePathResolver):
         # We don't clean up cached repos here, they'll be auto-cleaned based on access time # noqa: E501
 
 
-class KnowledgeGraph:
+# Serializes deferred field loads. Reentrant, as a loader may read other
+# deferred fields
+_LOADERS_LOCK = threading.RLock()
+
+
+class LazyFields:
+    """Resolve attributes from deferred loaders on first access"""
+
+    def __getattr__(self, name):
+        # Only reached when normal attribute lookup fails
+        loaders = self.__dict__.get("_loaders")
+        if loaders and name in loaders:
+            with _LOADERS_LOCK:
+                # Another thread may have loaded it while this one waited
+                if name in self.__dict__:
+                    return self.__dict__[name]
+                value = loaders[name]()
+                setattr(self, name, value)
+                del loaders[name]
+                return value
+        raise AttributeError(
+            f"{type(self).__name__!r} object has no attribute {name!r}"
+        )
+
+    def _load_all(self):
+        """Run every pending loader"""
+        for name in list(self.__dict__.get("_loaders", ())):
+            getattr(self, name)
+
+
+class NodeView(Mapping):
+    """Read-only {node_id: {"content", "meta"}} view over a KnowledgeGraph"""
+
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __getitem__(self, node_id):
+        iid = self._graph.node_index[node_id]
+        return {
+            "content": self._graph.get_content(iid),
+            "meta": self._graph.get_meta(iid),
+        }
+
+    def __contains__(self, node_id):
+        return node_id in self._graph.node_index
+
+    def __iter__(self):
+        return iter(self._graph.node_ids)
+
+    def __len__(self):
+        return len(self._graph.node_ids)
+
+
+class KnowledgeGraph(LazyFields):
+    # BM25 parameters
+    K1 = 1.5
+    B = 0.75
+
     def __init__(self):
-        self.nodes = {}
+        self.nodes = NodeView(self)
         self.graph = defaultdict(list)
-        self.index = defaultdict(list)
         self.class_registry = {}
         self.function_registry = {}
         self.parent_map = {}
         self.documents = []
 
+        # Dense int ids: position i describes node self.node_ids[i]
+        self.node_ids = []
+        self.node_index = {}
+        self.node_types = []
+        self.doc_lens = []
+        self.avgdl = 0.0
+
+        # Remaining node metadata, one column per field. Paths (and markdown
+        # full_content_ref values, which are paths too) are interned in path_pool
+        self.node_kinds = []
+        self.node_names = []
+        self.node_paths = []
+        self.node_lines = []
+        self.node_parents = []
+        self.node_chunk_counts = []
+        self.node_content_refs = []
+        self.path_pool = []
+        self.path_index = {}
+
+        # Inverted index: token -> term id, a row of the postings arrays below.
+        # Postings are stored CSR-style: the node ids and term frequencies of
+        # term t live in [postings_offsets[t], postings_offsets[t + 1]).
+        self.index = {}
+        self.postings_offsets = np.zeros(1, dtype=np.int64)
+        self.postings_nodes = np.zeros(0, dtype=np.int32)
+        self.postings_tfs = np.zeros(0, dtype=np.int32)
+        # Precomputed BM25 contribution of each posting to its node's score
+        self.postings_weights = np.zeros(0, dtype=np.float32)
+
+        # Build-time postings (token -> [(int id, tf)]), folded in by finalize()
+        self._postings = defaultdict(list)
+        self._dirty = False
+
     def add_node(self, content, meta):
-        node_id = hashlib.sha256(content.encode()).hexdigest()
-        self.nodes[node_id] = {"content": content, "meta": meta}
-        self.documents.append(content)
+        # Non-cryptographic hash: the id only needs to be a stable dict key
+        node_id = xxhash.xxh3_64_hexdigest(content.encode())
 
         # Index node type
         if meta["type"] == "py":
@@ -310,40 +479,167 @@ class KnowledgeGraph:
                 if meta["parent"]:
                     self.parent_map[node_id] = meta["parent"].lower()
 
-        # Index content
-        for token in self.tokenize(content):
-            self.index[token].append(node_id)
+        if not self._dirty:
+            self._thaw()
+
+        # Index content once per unique chunk; a repeated chunk only takes
+        # over the newer metadata
+        iid = self.node_index.get(node_id)
+        if iid is None:
+            iid = len(self.node_ids)
+            tokens = self.tokenize(content)
+            self.node_ids.append(node_id)
+            self.node_index[node_id] = iid
+            self.documents.append(content)
+            self.doc_lens.append(len(tokens))
+            for token, tf in Counter(tokens).items():
+                self._postings[token].append((iid, tf))
+        self._set_meta(iid, meta)
 
         return node_id
 
+    def _intern_path(self, path):
+        path_id = self.path_index.get(path)
+        if path_id is None:
+            path_id = self.path_index[path] = len(self.path_pool)
+            self.path_pool.append(path)
+        return path_id
+
+    def _set_meta(self, iid, meta):
+        """Store a node's metadata into the per-field columns"""
+        ref = meta.get("full_content_ref")
+        row = (
+            (self.node_kinds, meta["type"]),
+            (self.node_types, meta["node_type"]),
+            (self.node_names, meta.get("name")),
+            (self.node_paths, self._intern_path(meta.get("path"))),
+            (self.node_lines, meta.get("line")),
+            (self.node_parents, meta.get("parent")),
+            (self.node_chunk_counts, meta.get("total_chunks")),
+            (self.node_content_refs, None if ref is None else self._intern_path(ref)),
+        )
+        for column, value in row:
+            if iid == len(column):
+                column.append(value)
+            else:
+                column[iid] = value
+
+    def get_content(self, iid):
+        return self.documents[iid]
+
+    def get_meta(self, iid):
+        """Rebuild the metadata dict of a node from the columns"""
+        path_id = self.node_paths[iid]
+        meta = {
+            "type": self.node_kinds[iid],
+            "node_type": str(self.node_types[iid]),
+            "parent": self.node_parents[iid],
+        }
+        if self.path_pool[path_id] is not None:
+            meta["path"] = self.path_pool[path_id]
+        optional = (
+            ("name", self.node_names),
+            ("line", self.node_lines),
+            ("total_chunks", self.node_chunk_counts),
+        )
+        for key, column in optional:
+            if column[iid] is not None:
+                meta[key] = column[iid]
+        if self.node_content_refs[iid] is not None:
+            meta["full_content_ref"] = self.path_pool[self.node_content_refs[iid]]
+        return meta
+
+    def _thaw(self):
+        """Move finalized arrays back into build-time lists to accept new nodes"""
+        self._dirty = True
+        self.node_types = list(self.node_types)
+        self.doc_lens = list(self.doc_lens)
+        for token, term in self.index.items():
+            start, end = self.postings_offsets[term], self.postings_offsets[term + 1]
+            self._postings[token] = list(
+                zip(
+                    self.postings_nodes[start:end].tolist(),
+                    self.postings_tfs[start:end].tolist(),
+                )
+            )
+
+    def finalize(self):
+        """Pack build-time postings into contiguous NumPy arrays"""
+        if not self._dirty:
+            return
+
+        self.index = {}
+        offsets = [0]
+        nodes, tfs = [], []
+        for term, (token, postings) in enumerate(self._postings.items()):
+            self.index[token] = term
+            for iid, tf in postings:
+                nodes.append(iid)
+                tfs.append(tf)
+            offsets.append(len(nodes))
+
+        self.postings_offsets = np.array(offsets, dtype=np.int64)
+        self.postings_nodes = np.array(nodes, dtype=np.int32)
+        self.postings_tfs = np.array(tfs, dtype=np.int32)
+        self.node_types = np.array(self.node_types, dtype=str)
+        self.doc_lens = np.array(self.doc_lens, dtype=np.int32)
+        self.avgdl = float(self.doc_lens.mean()) if len(self.doc_lens) else 0.0
+        self.postings_weights = self._bm25_weights()
+
+        self._postings = defaultdict(list)
+        self._dirty = False
+
+    def _bm25_weights(self):
+        """BM25 weight of every posting, i.e. a sparse term x node score matrix"""
+        N = len(self.node_ids)
+        k1, b = self.K1, self.B
+        df = np.diff(self.postings_offsets)
+        idf = np.log((N - df + 0.5) / (df + 0.5) + 1)
+        tfs = self.postings_tfs
+        dls = self.doc_lens[self.postings_nodes]
+        weights = np.repeat(idf, df) * (tfs * (k1 + 1)) / (
+            tfs + k1 * (1 - b + b * dls / (self.avgdl or 1.0))
+        )
+        return weights.astype(np.float32)
+
     def tokenize(self, text):
-        return re.findall(r"\b\w+\b", text.lower())
+        return _TOKEN_RE.findall(text.lower())
 
     def bm25_search(self, query, top_n=3, exclude_types=None):
-        tokens = self.tokenize(query)
-        scores = defaultdict(float)
-        avgdl = sum(len(d.split()) for d in self.documents) / len(self.documents)
-        N = len(self.documents)
-        k1, b = 1.5, 0.75
-
-        for token in tokens:
-            df = len(self.index.get(token, []))
-            if df == 0:
-                continue
-            idf = log((N - df + 0.5) / (df + 0.5) + 1)
-            for node_id in self.index[token]:
-                node = self.nodes[node_id]
-                if exclude_types and node["meta"].get("node_type") in exclude_types:
-                    continue
-                doc = node["content"]
-                tf = doc.lower().count(token)
-                dl = len(doc.split())
-                score = idf * (tf * (k1 + 1)) / (tf + k1 * (1 - b + b * dl / avgdl))
-                scores[node_id] += score
+        self.finalize()
+        N = len(self.node_ids)
+        if N == 0:
+            return []
+
+        # Gather the posting ranges of all query terms, then sum the
+        # precomputed weights per node in a single pass
+        ranges = [
+            slice(self.postings_offsets[term], self.postings_offsets[term + 1])
+            for term in map(self.index.get, self.tokenize(query))
+            if term is not None
+        ]
+        if not ranges:
+            return []
+        scores = np.bincount(
+            np.concatenate([self.postings_nodes[r] for r in ranges]),
+            weights=np.concatenate([self.postings_weights[r] for r in ranges]),
+            minlength=N,
+        )
+
+        if exclude_types:
+            scores[np.isin(self.node_types, list(exclude_types))] = 0
+
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > top_n:
+            hits = hits[np.argpartition(-scores[hits], top_n)[:top_n]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(self.node_ids[i], float(scores[i])) for i in hits]
 
-        return sorted(scores.items(), key=lambda x: -x[1])[
-            :top_n
-        ]  # Now properly using top_n
+
+@lru_cache(maxsize=None)
+def _heading_pattern(min_section_level):
+    """Compiled markdown heading pattern for a minimum section level"""
+    return re.compile(rf"^#{{{min_section_level},}} ", re.MULTILINE)
 
 
 class Chunker:
@@ -352,21 +648,24 @@ class Chunker:
         # Convert path to string for serialization
         path_str = str(path) if isinstance(path, Path) else path
         # Split at heading levels equal to or greater than min_section_level
-        heading_pattern = rf"(?=^#{{{min_section_level},}} )"
-        chunks = re.split(heading_pattern, content, flags=re.MULTILINE)
+        heading_re = _heading_pattern(min_section_level)
+        bounds = [0, *(m.start() for m in heading_re.finditer(content)), len(content)]
+        sections = [content[a:b].strip() for a, b in zip(bounds, bounds[1:])]
+        sections = [section for section in sections if section]
         return [
             {
-                "content": chunk.strip(),
+                "content": section,
                 "meta": {
                     "type": "md",
                     "path": path_str,  # Store as string
                     "node_type": "section",
                     "parent": None,
-                    "full_content": content,  # Store original for potential replacement
+                    # Original is kept once per file in DocGraph.full_contents
+                    "full_content_ref": path_str,
+                    "total_chunks": len(sections),
                 },
             }
-            for chunk in chunks
-            if chunk.strip()
+            for section in sections
         ]
 
     @staticmethod
@@ -376,6 +675,17 @@ class Chunker:
         chunks = []
         tree = ast.parse(content)
 
+        # AST columns are UTF-8 byte offsets: slice node sources out of the
+        # encoded file using a line start table instead of re-splitting the
+        # whole file for every node as ast.get_source_segment() does
+        data = content.encode()
+        line_starts = [0, *(m.end() for m in _NEWLINE_RE.finditer(data))]
+
+        def source_segment(node):
+            start = line_starts[node.lineno - 1] + node.col_offset
+            end = line_starts[node.end_lineno - 1] + node.end_col_offset
+            return data[start:end].decode()
+
         class Collector(ast.NodeVisitor):
             def __init__(self):
                 self.stack = []
@@ -384,7 +694,7 @@ class Chunker:
             def visit_ClassDef(self, node):
                 self.current_class = node.name.lower()
                 chunk = {
-                    "content": ast.get_source_segment(content, node),
+                    "content": source_segment(node),
                     "meta": {
                         "type": "py",
                         "node_type": "class",
@@ -402,7 +712,7 @@ class Chunker:
 
             def visit_FunctionDef(self, node):
                 chunk = {
-                    "content": ast.get_source_segment(content, node),
+                    "content": source_segment(node),
                     "meta": {
                         "type": "py",
                         "node_type": "function",
@@ -421,13 +731,105 @@ class Chunker:
         return chunks
 
 
-class DocGraph:
+def _read_text(path):
+    """Read a UTF-8 source file, decoding large files straight from a mapping"""
+    path = Path(path)
+    if path.stat().st_size <= _MMAP_MIN_BYTES:
+        return path.read_text()
+    with open(path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        text = str(mm, "utf-8")
+    # Match read_text()'s universal newline translation
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def _write_all(f, buffers):
+    """Write buffers to an unbuffered file, in one scatter-gather call where
+    the platform has writev()"""
+    if not hasattr(os, "writev"):
+        for data in buffers:
+            f.write(data)
+        return
+    views = [memoryview(data) for data in buffers if len(data)]
+    while views:
+        written = os.writev(f.fileno(), views[:_IOV_MAX])
+        # Drop what was written, resuming partial writes mid-buffer
+        while views and written >= len(views[0]):
+            written -= len(views.pop(0))
+        if written:
+            views[0] = views[0][written:]
+
+
+def _pool_context():
+    """Context to fork build workers from, or None to parse in-process.
+
+    Workers are only forked from a single-threaded caller, as forking while
+    another thread holds a lock can deadlock the child. Fork servers and
+    spawned workers avoid that but re-run the caller's script, which breaks
+    scripts without a __main__ guard.
+
+    The pool is therefore effectively sync-only: Doc2Talk's async methods
+    build on an executor thread, and any other live thread (e.g. litellm
+    retrying its model cost map download while offline) also disables it.
+    """
+    if threading.active_count() > 1:
+        return None
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    return multiprocessing.get_context("fork")
+
+
+def _madvise(mm, advice, offset=0, size=None):
+    """Best-effort madvise() of a mapped region (a no-op where unsupported)"""
+    option = getattr(mmap, advice, None)
+    if option is None:
+        return
+    # The start of the region must be page-aligned
+    start = offset - offset % mmap.PAGESIZE
+    length = len(mm) - start if size is None else size + offset - start
+    if length <= 0:
+        return
+    try:
+        mm.madvise(option, start, length)
+    except (OSError, ValueError):
+        pass
+
+
+def _chunk_file(job):
+    """Read and chunk one source file; runs in pool worker processes"""
+    kind, path_str = job
+    path = Path(path_str)
+    if kind == "py":
+        return Chunker.chunk_python(_read_text(path), path)
+    return Chunker.chunk_markdown(_read_text(path), path)
+
+
+class DocGraph(LazyFields):
     RESOLVERS = [LocalResolver(), GitHubResolver()]
 
     # Add class constants
-    _CACHE_VERSION = 2
+    _CACHE_VERSION = 12
     _MAGIC_HEADER = b"C4AIV2"
     _COMPRESS_LEVEL = 3  # Balanced speed/ratio
+    _OPTIMIZE_LEVEL = 19  # Slow, smallest output for persist(optimize=True)
+    _DICT_SIZE = 64 * 1024  # Trained zstd dictionary size
+    _DICT_SAMPLES = 1024  # Chunks sampled to train the dictionary
+    # Smaller builds are parsed in-process: forking 4 workers costs ~30ms
+    # and saves ~2ms per file on 2 cores
+    _PARALLEL_MIN_FILES = 32
+    _FRAME_ENTRY = struct.Struct("!32sQQ")  # name, offset, size
+    _ARRAY_ALIGN = 64  # Raw array frames start on cache-line boundaries
+    # Frames holding raw NumPy buffers rather than msgpack
+    _ARRAY_FRAMES = {
+        "doc_lens": np.int32,
+        "postings_offsets": np.int64,
+        "postings_nodes": np.int32,
+        "postings_tfs": np.int32,
+        "postings_weights": np.float32,
+    }
 
     def __init__(self, code_source=None, docs_source=None, exclude=None):
         # Add initialization flags
@@ -476,91 +878,255 @@ class DocGraph:
                 return resolver
         raise ValueError(f"No valid resolver found for: {path}")
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Release the cache file mapping, loading any deferred fields first.
+
+        Arrays a caller took from the graph before closing may still view the
+        mapping; it is then left open until they are garbage collected.
+        """
+        self._load_all()
+        self.graph._load_all()
+        if self._mmap:
+            # Arrays still viewing the mapping are copied out before unmapping
+            for name in self._ARRAY_FRAMES:
+                if isinstance(getattr(self.graph, name), np.ndarray):
+                    setattr(self.graph, name, getattr(self.graph, name).copy())
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Views are still exported; the mmap unmaps itself once freed
+                pass
+            self._mmap = None
+
     def __del__(self):
-        """Cleanup mmap when destroyed"""
-        if hasattr(self, "_mmap") and self._mmap:
-            self._mmap.close()
-        # Rest of original cleanup
+        """Cleanup resolvers when destroyed"""
+        # The mmap is left to close itself: deferred loaders of a graph that
+        # outlives this instance may still reference it
         for resolver in getattr(self, "resolvers", []):
             if hasattr(resolver, "cleanup"):
                 resolver.cleanup()
 
-    def persist(self, path):
-        """Save optimized index format"""
+    def persist(self, path, optimize=False):
+        """Save optimized index format.
+
+        With optimize=True, frames are compressed at a much higher zstd level:
+        slower to write once, fewer bytes to read on every load().
+
+        Layout: MAGIC | version | dict_len | dict | n_frames |
+        [name, offset, size] * n_frames | frames. Each field is its own zstd
+        frame so load() can decompress fields lazily, except NumPy arrays,
+        which are stored raw and aligned so load() can map them in place.
+        """
+        self.graph.finalize()
+        graph = self.graph
+
         # Convert Path objects to strings
-        state = {
-            "graph": {
-                "nodes": self.graph.nodes,
-                "graph": self.graph.graph,
-                "index": self.graph.index,
-                "class_registry": self.graph.class_registry,
-                "function_registry": self.graph.function_registry,
-                "parent_map": self.graph.parent_map,
-                "documents": self.graph.documents,
+        code_root = str(self.code_root) if hasattr(self, "code_root") else None
+        docs_root = str(self.docs_root) if hasattr(self, "docs_root") else None
+        frames = {
+            "meta": {
+                "code_root": code_root,
+                "docs_root": docs_root,
+                "exclude": self.exclude,
+                "avgdl": graph.avgdl,
             },
-            "code_root": str(self.code_root) if hasattr(self, "code_root") else None,
-            "docs_root": str(self.docs_root) if hasattr(self, "docs_root") else None,
-            "exclude": self.exclude,
-            "version": self._CACHE_VERSION,
+            "graph": graph.graph,
+            "index": graph.index,
+            "class_registry": graph.class_registry,
+            "function_registry": graph.function_registry,
+            "parent_map": graph.parent_map,
+            "documents": graph.documents,
+            "node_ids": graph.node_ids,
+            "node_types": np.asarray(graph.node_types).tolist(),
+            "node_kinds": graph.node_kinds,
+            "node_names": graph.node_names,
+            "node_paths": graph.node_paths,
+            "node_lines": graph.node_lines,
+            "node_parents": graph.node_parents,
+            "node_chunk_counts": graph.node_chunk_counts,
+            "path_pool": graph.path_pool,
+            "node_content_refs": graph.node_content_refs,
+            "doc_lens": graph.doc_lens,
+            "postings_offsets": graph.postings_offsets,
+            "postings_nodes": graph.postings_nodes,
+            "postings_tfs": graph.postings_tfs,
+            "postings_weights": graph.postings_weights,
+            "file_keys": getattr(self, "file_keys", {}),
+            "full_contents": getattr(self, "full_contents", {}),
         }
 
-        # Use compressed MessagePack format
-        cctx = zstd.ZstdCompressor(level=self._COMPRESS_LEVEL)
-        packed = msgpack.packb(state)
-        compressed = cctx.compress(packed)
+        # Use compressed MessagePack format, with a dictionary trained on the
+        # indexed sources when there is enough text to train one
+        dict_data = self._train_dictionary(graph.documents)
+        dict_bytes = dict_data.as_bytes() if dict_data else b""
+        level = self._OPTIMIZE_LEVEL if optimize else self._COMPRESS_LEVEL
+        # threads=-1 compresses large frames on all cores; small ones are
+        # unaffected
+        cctx = zstd.ZstdCompressor(level=level, dict_data=dict_data, threads=-1)
+        payloads = []
+        for name, value in frames.items():
+            if name in self._ARRAY_FRAMES:
+                # Written straight from the array buffer, without a bytes copy
+                array = np.ascontiguousarray(value, self._ARRAY_FRAMES[name])
+                data = memoryview(array).cast("B")
+            else:
+                data = cctx.compress(msgpack.packb(value))
+            payloads.append((name, data))
+
+        header = (
+            self._MAGIC_HEADER
+            + struct.pack("!I", self._CACHE_VERSION)
+            + struct.pack("!I", len(dict_bytes))
+            + dict_bytes
+            + struct.pack("!I", len(payloads))
+        )
+        offset = len(header) + len(payloads) * self._FRAME_ENTRY.size
+        table, body = [], []
+        for name, data in payloads:
+            if name in self._ARRAY_FRAMES:
+                padding = -offset % self._ARRAY_ALIGN
+                body.append(b"\0" * padding)
+                offset += padding
+            table.append(self._FRAME_ENTRY.pack(name.encode(), offset, len(data)))
+            body.append(data)
+            offset += len(data)
+
+        # Write aside and swap in: arrays loaded from the old file may still
+        # view its mapping, which must not be truncated under them. The temp
+        # name is unique per call, so concurrent writers never share one
+        fd, tmp_path = tempfile.mkstemp(dir=Path(path).parent, suffix=".tmp")
+        try:
+            with open(fd, "wb", buffering=0) as f:
+                _write_all(f, [header, b"".join(table), *body])
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, _FILE_MODE)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
 
-        with open(path, "wb") as f:
-            f.write(self._MAGIC_HEADER)
-            f.write(struct.pack("!I", self._CACHE_VERSION))
-            f.write(struct.pack("!Q", len(compressed)))
-            f.write(compressed)
+    @classmethod
+    def _train_dictionary(cls, documents):
+        """Train a zstd dictionary on a sample of chunk contents"""
+        samples = [d.encode() for d in documents[: cls._DICT_SAMPLES]]
+        try:
+            return zstd.train_dictionary(cls._DICT_SIZE, samples)
+        except zstd.ZstdError:
+            # Too few or too small samples to train on
+            return None
 
     @classmethod
     def load(cls, path):
-        """Ultra-fast mmap-based loading"""
+        """Ultra-fast mmap-based loading, decompressing fields on first access"""
         with open(path, "rb") as f:
             mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
-            # Verify header
-            if mm[: len(cls._MAGIC_HEADER)] != cls._MAGIC_HEADER:
-                raise ValueError("Invalid cache format")
-
-            version = struct.unpack("!I", mm[6:10])[0]
-            if version != cls._CACHE_VERSION:
-                raise ValueError("Cache version mismatch")
-
-            data_size = struct.unpack("!Q", mm[10:18])[0]
-            compressed = mm[18 : 18 + data_size]
-
-        # Decompress and unpack
-        dctx = zstd.ZstdDecompressor()
-        packed = dctx.decompress(compressed)
-        state = msgpack.unpackb(packed)
+        # Verify header
+        if mm[: len(cls._MAGIC_HEADER)] != cls._MAGIC_HEADER:
+            raise ValueError("Invalid cache format")
+
+        version = struct.unpack("!I", mm[6:10])[0]
+        if version != cls._CACHE_VERSION:
+            raise ValueError("Cache version mismatch")
+
+        dict_size = struct.unpack("!I", mm[10:14])[0]
+        pos = 14 + dict_size
+        dict_data = zstd.ZstdCompressionDict(mm[14:pos]) if dict_size else None
+
+        # Read the frame directory
+        n_frames = struct.unpack("!I", mm[pos : pos + 4])[0]
+        pos += 4
+        frames = {}
+        for _ in range(n_frames):
+            name, offset, size = cls._FRAME_ENTRY.unpack_from(mm, pos)
+            frames[name.rstrip(b"\0").decode()] = (offset, size)
+            pos += cls._FRAME_ENTRY.size
+
+        # A truncated file would otherwise only fail on first access to a frame
+        for name, (offset, size) in frames.items():
+            if offset + size > len(mm):
+                mm.close()
+                raise ValueError(f"Truncated cache: frame {name!r} is incomplete")
+
+        # Compressed frames are read front to back once; posting arrays are
+        # sliced at random per query term, where readahead only wastes I/O
+        _madvise(mm, "MADV_SEQUENTIAL")
+        for name in cls._ARRAY_FRAMES:
+            _madvise(mm, "MADV_RANDOM", *frames[name])
+
+        dctx = zstd.ZstdDecompressor(dict_data=dict_data)
+
+        def frame(name):
+            offset, size = frames[name]
+            if name in cls._ARRAY_FRAMES:
+                # Zero-copy, read-only view of the mapped file
+                dtype = np.dtype(cls._ARRAY_FRAMES[name])
+                return np.frombuffer(
+                    mm, dtype=dtype, count=size // dtype.itemsize, offset=offset
+                )
+            return msgpack.unpackb(dctx.decompress(mm[offset : offset + size]))
 
         # Reconstruct object
+        meta = frame("meta")
         instance = cls.__new__(cls)
         instance._from_cache = True
         instance._mmap = mm  # Keep mmap reference
 
-        # Rebuild KnowledgeGraph
-        instance.graph = KnowledgeGraph()
-        instance.graph.nodes = state["graph"]["nodes"]
-        # Convert graph back to defaultdict(list)
-        instance.graph.graph = defaultdict(list, state["graph"]["graph"])
-        # Convert index back to defaultdict(list)
-        instance.graph.index = defaultdict(list, state["graph"]["index"])
-        instance.graph.class_registry = state["graph"]["class_registry"]
-        instance.graph.function_registry = state["graph"]["function_registry"]
-        instance.graph.parent_map = state["graph"]["parent_map"]
-        instance.graph.documents = state["graph"]["documents"]
-
         # Convert string paths back to Path objects
-        if state["code_root"]:
-            instance.code_root = Path(state["code_root"])
-        if state["docs_root"]:
-            instance.docs_root = Path(state["docs_root"])
+        if meta["code_root"]:
+            instance.code_root = Path(meta["code_root"])
+        if meta["docs_root"]:
+            instance.docs_root = Path(meta["docs_root"])
+        instance.exclude = meta["exclude"]
+        instance._loaders = {
+            "file_keys": lambda: frame("file_keys"),
+            "full_contents": lambda: frame("full_contents"),
+        }
 
-        instance.exclude = state["exclude"]
+        # Rebuild KnowledgeGraph; fields are decompressed on first access
+        graph = KnowledgeGraph.__new__(KnowledgeGraph)
+        graph._postings = defaultdict(list)
+        graph._dirty = False
+        graph.avgdl = meta["avgdl"]
+        graph._loaders = {
+            name: (lambda name=name: frame(name))
+            for name in (
+                "index",
+                "class_registry",
+                "function_registry",
+                "parent_map",
+                "documents",
+                "node_ids",
+                "node_kinds",
+                "node_names",
+                "node_paths",
+                "node_lines",
+                "node_parents",
+                "node_chunk_counts",
+                "path_pool",
+                "node_content_refs",
+                *cls._ARRAY_FRAMES,
+            )
+        }
+        # Convert graph back to defaultdict(list)
+        graph._loaders["graph"] = lambda: defaultdict(list, frame("graph"))
+        graph._loaders["node_types"] = lambda: np.array(
+            frame("node_types"), dtype=str
+        )
+        graph._loaders["node_index"] = lambda: {
+            nid: i for i, nid in enumerate(graph.node_ids)
+        }
+        graph._loaders["path_index"] = lambda: {
+            path: i for i, path in enumerate(graph.path_pool)
+        }
+        graph.nodes = NodeView(graph)
+        instance.graph = graph
 
         return instance
 
@@ -568,25 +1134,104 @@ class DocGraph:
         path_str = str(path)
         return any(fnmatch.fnmatch(path_str, pattern) for pattern in self.exclude)
 
-    def _build_graph(self):
-        # Process code
-        for py_path in self.code_root.rglob("*.py"):
-            if self._is_excluded(py_path):
-                continue
-            chunks = Chunker.chunk_python(py_path.read_text(), py_path)
-            self._add_to_graph(chunks)
+    def update(self, code_source=None, docs_source=None, exclude=None):
+        """Rebuild the graph, re-parsing only files changed since the last build.
 
-        # Process documentation
-        for md_path in self.docs_root.rglob("*.md"):
-            if self._is_excluded(md_path):
-                continue
-            chunks = Chunker.chunk_markdown(md_path.read_text(), md_path)
-            self._add_to_graph(chunks)
+        Sources default to the roots this graph was built from; pass them
+        again to refresh remote (GitHub) checkouts first.
+        """
+        if exclude is not None:
+            self.exclude = exclude
+        if code_source or docs_source:
+            self._setup_paths(code_source, docs_source)
+
+        previous, self.graph = self.graph, KnowledgeGraph()
+        self._build_graph(previous)
+
+    def _build_graph(self, previous=None):
+        # Per-file (mtime_ns, size, node ids, chunk metas), used to skip
+        # unchanged files on the next update(). The metas are kept per file
+        # because the graph columns only hold the last file's metadata for a
+        # chunk that several files share
+        file_keys, self.file_keys = getattr(self, "file_keys", {}), {}
+        # Original text of each markdown file, referenced by its sections
+        full_contents, self.full_contents = getattr(self, "full_contents", {}), {}
+
+        # Collect files, reusing chunks of files unchanged since `previous`
+        files = []
+        sources = [(self.code_root, "py"), (self.docs_root, "md")]
+        for root, kind in sources:
+            for path in root.rglob(f"*.{kind}"):
+                if self._is_excluded(path):
+                    continue
+                path_str = str(path)
+                st = path.stat()
+                key = file_keys.get(path_str)
+                chunks = None
+                if (
+                    previous is not None
+                    and key
+                    and (key[0], key[1]) == (st.st_mtime_ns, st.st_size)
+                    and all(nid in previous.nodes for nid in key[2])
+                ):
+                    chunks = [
+                        {
+                            "content": previous.get_content(previous.node_index[nid]),
+                            "meta": meta,
+                        }
+                        for nid, meta in zip(key[2], key[3])
+                    ]
+                    if kind == "md":
+                        self.full_contents[path_str] = full_contents[path_str]
+                files.append((kind, path_str, st, chunks))
+
+        # Parse the rest, merging into the graph serially in file order.
+        # Markdown is read here (its text is kept anyway) and split in-process
+        parsed = self._chunk_files(
+            [
+                (kind, path_str)
+                for kind, path_str, _, chunks in files
+                if chunks is None and kind == "py"
+            ]
+        )
+        for kind, path_str, st, chunks in files:
+            if chunks is None and kind == "md":
+                content = self.full_contents[path_str] = _read_text(path_str)
+                chunks = Chunker.chunk_markdown(content, path_str)
+            elif chunks is None:
+                chunks = next(parsed)
+            node_ids = self._add_to_graph(chunks)
+            metas = [chunk["meta"] for chunk in chunks]
+            self.file_keys[path_str] = (st.st_mtime_ns, st.st_size, node_ids, metas)
+
+        # Pack the inverted index for querying
+        self.graph.finalize()
+
+    def _chunk_files(self, jobs):
+        """Chunk (kind, path) jobs in order, in a process pool for large batches"""
+        workers = os.cpu_count() or 1
+        context = _pool_context()
+        if workers == 1 or len(jobs) < self._PARALLEL_MIN_FILES or context is None:
+            yield from map(_chunk_file, jobs)
+            return
+        done = 0
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=context
+            ) as executor:
+                for chunks in executor.map(_chunk_file, jobs, chunksize=8):
+                    yield chunks
+                    done += 1
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); finish in-process
+            yield from map(_chunk_file, jobs[done:])
 
     def _add_to_graph(self, chunks):
+        node_ids = []
         node_relations = {}
         for chunk in chunks:
             node_id = self.graph.add_node(chunk["content"], chunk["meta"])
+            node_ids.append(node_id)
 
             # Link markdown to classes
             if chunk["meta"]["type"] == "md":
@@ -598,11 +1243,13 @@ class DocGraph:
             if chunk["meta"].get("parent"):
                 node_relations[chunk["meta"]["name"].lower()] = node_id
 
+        return node_ids
+
     def query(self, question, top_n=10, top_m=3, file_coverage=0.6):
         doc_nodes = self.graph.bm25_search(
             question, top_n=top_n, exclude_types={"class", "function"}
         )
-        class_nodes = self._find_related_classes(doc_nodes, question)
+        class_nodes = self._find_related_classes(doc_nodes, question, top_m)
         result = self._format_results(
             doc_nodes[:top_n], class_nodes[:top_m], [], file_coverage
         )
@@ -613,90 +1260,78 @@ class DocGraph:
 
         # return self._format_results(doc_nodes[:top_n], class_nodes[:top_m], functions, file_coverage) # noqa: E501
 
-    def _bm25_score(self, query, documents):
-        """Generic BM25 scoring for arbitrary documents"""
-        tokens = self.graph.tokenize(query)
-        scores = defaultdict(float)
-        avgdl = sum(len(d[1].split()) for d in documents) / len(documents)
-        N = len(documents)
-        k1, b = 1.5, 0.75
-
-        # Document frequency calculation
-        df = defaultdict(int)
-        for _, content in documents:
-            seen = set()
-            for token in self.graph.tokenize(content):
-                if token not in seen:
-                    df[token] += 1
-                    seen.add(token)
-
-        # Score calculation
-        for cid, content in documents:
-            doc_tokens = self.graph.tokenize(content)
-            dl = len(doc_tokens)
-            for token in tokens:
-                if token not in df:
-                    continue
-                tf = doc_tokens.count(token)
-                idf = log((N - df[token] + 0.5) / (df[token] + 0.5) + 1)
-                score = idf * (tf * (k1 + 1)) / (tf + k1 * (1 - b + b * dl / avgdl))
-                scores[cid] += score
-
-        return scores
-
-    def _find_related_classes(self, doc_nodes, query):
-        # Get initial class connections
-        class_candidates = set()
-        doc_scores = {nid: score for nid, score in doc_nodes}
-        for node_id, _ in doc_nodes:
-            # Safely access graph to handle cases where node_id doesn't exist in graph
-            if node_id in self.graph.graph:
-                class_candidates.update(self.graph.graph[node_id])
-            # Even with defaultdict(list), explicitly check to make code more robust
-
-        if not class_candidates:
-            return []
+    def _bm25_score(self, query, candidates):
+        """BM25 scores of a subset of nodes (int ids), using indexed postings"""
+        graph = self.graph
+        graph.finalize()
+        dls_all = graph.doc_lens
+        avgdl = float(dls_all[candidates].mean())
+        N = len(candidates)
+        k1, b = graph.K1, graph.B
+
+        scores = np.zeros(len(graph.node_ids), dtype=np.float64)
+        for token in graph.tokenize(query):
+            term = graph.index.get(token)
+            if term is None:
+                continue
+            start, end = graph.postings_offsets[term], graph.postings_offsets[term + 1]
+            # Document frequency within the candidate subset only
+            in_subset = np.isin(graph.postings_nodes[start:end], candidates)
+            df = int(in_subset.sum())
+            if df == 0:
+                continue
+            nids = graph.postings_nodes[start:end][in_subset]
+            tfs = graph.postings_tfs[start:end][in_subset]
+            idf = log((N - df + 0.5) / (df + 0.5) + 1)
+            scores[nids] += idf * (tfs * (k1 + 1)) / (
+                tfs + k1 * (1 - b + b * dls_all[nids] / avgdl)
+            )
 
-        # Score classes using their own content BM25
-        class_contents = [
-            (cid, self.graph.nodes[cid]["content"]) for cid in class_candidates
-        ]
-        class_scores = self._bm25_score(query, class_contents)
+        return scores[candidates]
 
-        # Scale down the class_scores by the max score
-        max_score = max(class_scores.values())
-        class_scores = {k: v / max_score for k, v in class_scores.items()}
+    def _find_related_classes(self, doc_nodes, query, top_m=None):
+        graph = self.graph
 
-        # Extract [(doc_id, score)] pairs
-        doc_nodes = [(nid, score) for nid, score in doc_nodes]
-        # Scale down the doc_nodes scores by the max score
-        max_score = max(doc_scores.values())
-        doc_scores = [(nid, score / max_score) for nid, score in doc_nodes]
+        # Get initial class connections as sorted int ids per document
+        doc_links = []
+        for node_id, score in doc_nodes:
+            # Safely access graph to handle cases where node_id doesn't exist in graph
+            if graph.graph.get(node_id):
+                links = np.unique(
+                    [graph.node_index[cid] for cid in graph.graph[node_id]]
+                )
+                doc_links.append((links, score))
 
-        # Calculate documentation mention scores
-        doc_mention_scores = defaultdict(float)
-        for cid in class_candidates:
-            for doc_node_id, score in doc_scores:
-                if cid in self.graph.graph[doc_node_id]:
-                    doc_mention_scores[cid] += score * 0.7  # Base documentation weight
+        if not doc_links:
+            return []
+        class_ids = np.unique(np.concatenate([links for links, _ in doc_links]))
+
+        # Score classes using their own content BM25, scaled by the max score
+        class_scores = self._bm25_score(query, class_ids)
+        class_scores /= class_scores.max() or 1.0
+
+        # Calculate documentation mention scores from max-scaled doc scores
+        max_doc_score = max(score for _, score in doc_nodes)
+        doc_mention_scores = np.zeros(len(class_ids), dtype=np.float64)
+        for links, score in doc_links:
+            # Base documentation weight
+            doc_mention_scores[np.searchsorted(class_ids, links)] += (
+                score / max_doc_score * 0.7
+            )
 
         # # scale down the doc_mention_scores by the max score
-        max_score = max(doc_mention_scores.values())
-        doc_mention_scores = {k: v / max_score for k, v in doc_mention_scores.items()}
-
-        # Dynamic combination with non-linear scaling
-        combined = defaultdict(float)
-        data = []
-        for cid in class_candidates:
-            bm25 = class_scores.get(cid, 0)
-            docs_score = doc_mention_scores.get(cid, 0)
+        doc_mention_scores /= doc_mention_scores.max()
 
-            # Dynamic dampening factor based on BM25 score magnitude
-            dampening = 1 / (1 + abs(bm25) ** 1.5)  # Quadratic dampening
-            combined[cid] = bm25 + (docs_score * dampening)
-            data.append((cid, bm25, docs_score, dampening, combined[cid]))
+        # Dynamic combination with non-linear scaling: dampen the doc
+        # mentions of classes by their BM25 score magnitude
+        dampening = 1 / (1 + np.power(np.abs(class_scores), 1.5))
+        combined = class_scores + doc_mention_scores * dampening
 
-        return sorted(combined.items(), key=lambda x: -x[1])
+        order = np.arange(len(class_ids))
+        if top_m is not None and len(order) > top_m:
+            order = np.argpartition(-combined, top_m)[:top_m]
+        order = order[np.argsort(-combined[order], kind="stable")]
+        return [(graph.node_ids[class_ids[i]], float(combined[i])) for i in order]
 
     def _format_results(
         self, doc_nodes, class_nodes, function_nodes, file_coverage=0.6
@@ -711,8 +1346,9 @@ class DocGraph:
         final_docs = []
         for path, nodes in file_map.items():
             try:
-                full_content = nodes[0]["meta"]["full_content"]
-                total_chunks = len(Chunker.chunk_markdown(full_content, path))
+                ref = nodes[0]["meta"]["full_content_ref"]
+                full_content = self.full_contents[ref]
+                total_chunks = nodes[0]["meta"]["total_chunks"]
                 selected_chunks = len(nodes)
 
                 if selected_chunks / total_chunks >= file_coverage:
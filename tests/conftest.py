@@ -0,0 +1,41 @@
+"""
+Shared fixtures for the doc2talk test suite
+"""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from doc2talk import Doc2Talk
+
+# Run async tests on the libuv-based event loop when it is installed
+try:
+    import uvloop
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
+
+
+# Scratch directory for test artifacts, resolved and created once per run
+TMP_DIR = (Path(__file__).parent / ".." / "tmp").resolve()
+TMP_DIR.mkdir(exist_ok=True)
+
+
+@pytest.fixture(scope="session")
+def tmp_dir():
+    return TMP_DIR
+
+
+@pytest.fixture(scope="session")
+def doc2talk_app():
+    """One Doc2Talk instance per run, so the index is loaded only once"""
+    return Doc2Talk(cache_id="test_cache")
+
+
+@pytest.fixture
+def doc2talk(doc2talk_app):
+    """The shared instance, switched to a fresh chat session for each test"""
+    doc2talk_app.new_session()
+    return doc2talk_app
@@ -4,28 +4,63 @@ Test script for doc2talk core functionality
 
 import asyncio
 import sys
+import time
 from pathlib import Path
 
+import pytest
+
 # Add the parent directory to the path for importing the package
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.doc2talk.core import ChatEngine, ChatSession
 
+CODE_SOURCE = "https://github.com/unclecode/crawl4ai/tree/main/crawl4ai"
+DOCS_SOURCE = "https://github.com/unclecode/crawl4ai/tree/main/docs/md_v2"
+
+
+def create_engine():
+    """Initialize a chat engine with GitHub repositories"""
+    print("Initializing chat engine...")
+    return ChatEngine(code_source=CODE_SOURCE, docs_source=DOCS_SOURCE)
+
+
+class BatchedPrinter:
+    """Print streamed chunks in batches rather than flushing stdout per token"""
+
+    def __init__(self, max_chunks=32, interval=0.05):
+        self.max_chunks = max_chunks
+        self.interval = interval
+        self.pending = []
+        self.last_flush = time.monotonic()
 
-async def test_basic_question():
+    def write(self, chunk):
+        self.pending.append(chunk)
+        if (
+            len(self.pending) >= self.max_chunks
+            or time.monotonic() - self.last_flush >= self.interval
+        ):
+            self.flush()
+
+    def flush(self):
+        sys.stdout.write("".join(self.pending))
+        sys.stdout.flush()
+        self.pending.clear()
+        self.last_flush = time.monotonic()
+
+
+@pytest.fixture(scope="module")
+def engine():
+    """One engine for the whole module: the repos are fetched and indexed once"""
+    return create_engine()
+
+
+@pytest.mark.asyncio
+async def test_basic_question(engine):
     """Test a basic question about the crawl4ai codebase"""
 
     print("Creating chat session...")
     session = ChatSession()
 
-    # Initialize chat engine with GitHub repositories
-    print("Initializing chat engine...")
-    engine = ChatEngine(
-        code_source="https://github.com/unclecode/crawl4ai/tree/main/crawl4ai",
-        docs_source="https://github.com/unclecode/crawl4ai/tree/main/docs/md_v2",
-        # force_rebuild=True,
-    )
-
     # Ask a simple question
     question = "How does the crawl4ai extractor functionality work?"
     question = """As an Crawl4ai Experts, answer this question a user asked in our discord.
@@ -55,35 +90,47 @@ I need you to generate the minimal code to show the user the idea and also add a
 
     return answer
 
-async def test_streaming_response():
+@pytest.mark.asyncio
+async def test_streaming_response(engine):
     """Test streaming response functionality"""
 
     print("Creating chat session...")
     session = ChatSession()
 
-    # Initialize chat engine with GitHub repositories
-    print("Initializing chat engine...")
-    engine = ChatEngine(
-        code_source="https://github.com/unclecode/crawl4ai/tree/main/crawl4ai",
-        docs_source="https://github.com/unclecode/crawl4ai/tree/main/docs/md_v2",
-    )
-
-    # Ask a simple question
-    question = "What are the main components of crawl4ai architecture?"
-    session.add_message("user", question)
-
-    print(f"\nUser: {question}")
-    print("\nDocTalk: ", end="", flush=True)
-
-    # Update context first
-    decision = await engine.get_context_decision(session, question)
-    await engine.update_context(session, question, decision)
+    # Ask a simple question, then a follow-up
+    questions = [
+        "What are the main components of crawl4ai architecture?",
+        "How do those components work together during a crawl?",
+    ]
 
-    # Get streaming response
-    async for chunk in engine.generate_response_stream(session, question):
-        print(chunk, end="", flush=True)
-
-    print("\n")
+    # Request the first context decision right away; each later one is
+    # requested while the previous answer is still streaming
+    decision_task = asyncio.create_task(
+        engine.get_context_decision(session, questions[0])
+    )
+    for i, question in enumerate(questions):
+        session.add_message("user", question)
+
+        print(f"\nUser: {question}")
+        print("\nDocTalk: ", end="", flush=True)
+
+        # Update context once the decision is in
+        decision = await decision_task
+        await engine.update_context(session, question, decision)
+
+        # Get streaming response
+        next_question = questions[i + 1] if i + 1 < len(questions) else None
+        printer = BatchedPrinter()
+        async for chunk in engine.generate_response_stream(session, question):
+            if next_question:
+                decision_task = asyncio.create_task(
+                    engine.get_context_decision(session, next_question)
+                )
+                next_question = None
+            printer.write(chunk)
+        printer.flush()
+
+        print("\n")
 
     # Print context status
     status = session.context_manager.get_status()
@@ -97,13 +144,24 @@ if __name__ == "__main__":
     print("Testing doc2talk core functionality...")
     print("=" * 50)
 
+    # Prefer the libuv-based event loop when it is installed
+    try:
+        import uvloop
+
+        uvloop.install()
+    except ImportError:
+        pass
+
+    # Build the engine once and share it between the tests
+    engine = create_engine()
+
     # # Choose test function
     # test_streaming = len(sys.argv) > 1 and sys.argv[1] == "--stream"
 
     # if test_streaming:
-    #     asyncio.run(test_streaming_response())
+    #     asyncio.run(test_streaming_response(engine))
     # else:
-    #     asyncio.run(test_basic_question())
+    #     asyncio.run(test_basic_question(engine))
 
-    # asyncio.run(test_basic_question())
-    asyncio.run(test_streaming_response())
+    # asyncio.run(test_basic_question(engine))
+    asyncio.run(test_streaming_response(engine))
@@ -3,28 +3,20 @@ Test module for Doc2Talk facade
 """
 
 import asyncio
-import os
-from pathlib import Path
 
 import pytest
 
 from doc2talk import Doc2Talk
 
 
-def test_basic_usage():
+@pytest.mark.asyncio
+async def test_basic_usage(doc2talk):
     """Test basic usage of Doc2Talk facade"""
-    # Use a temporary location for testing
-    tmp_dir = Path(os.path.dirname(__file__)) / ".." / "tmp"
-    tmp_dir.mkdir(exist_ok=True)
-    
-    # Create a Doc2Talk instance with minimal configuration (use cache)
-    doc2talk = Doc2Talk(cache_id="test_cache")
-    
     # Get session ID
     assert doc2talk.session_id is not None
     
     # Chat with non-streaming
-    response = doc2talk.chat("What is the core functionality of the project?")
+    response = await doc2talk.chat_async("What is the core functionality of the project?")
     assert isinstance(response, str)
     assert len(response) > 0
     
@@ -35,31 +27,31 @@ def test_basic_usage():
 
 
 @pytest.mark.asyncio
-async def test_async_usage():
+async def test_async_usage(doc2talk):
     """Test async usage of Doc2Talk facade"""
-    # Create a Doc2Talk instance
-    doc2talk = Doc2Talk(cache_id="test_cache")
-    
-    # Chat with async non-streaming
-    response = await doc2talk.chat_async("How do I use the library?")
+    # A second instance with its own session; the knowledge graph itself is
+    # shared between engines over the same cache
+    doc2talk2 = Doc2Talk(cache_id="test_cache")
+
+    async def collect(stream):
+        return [chunk async for chunk in stream]
+
+    # Async non-streaming and streaming chats are independent, run them together
+    response, chunks = await asyncio.gather(
+        doc2talk.chat_async("How do I use the library?"),
+        collect(doc2talk2.chat_stream_async("Tell me about the project architecture")),
+    )
+
     assert isinstance(response, str)
     assert len(response) > 0
-    
-    # Test streaming response
-    chunks = []
-    async for chunk in doc2talk.chat_stream_async("Tell me about the project architecture"):
-        chunks.append(chunk)
-    
+
     assert len(chunks) > 0
     assert "".join(chunks)
 
 
-def test_index_management():
+@pytest.mark.asyncio
+async def test_index_management(tmp_dir):
     """Test index building and loading"""
-    # Use a temporary location for testing
-    tmp_dir = Path(os.path.dirname(__file__)) / ".." / "tmp"
-    tmp_dir.mkdir(exist_ok=True)
-    
     # Path for test index
     test_index_path = tmp_dir / "test_index.c4ai"
     
@@ -74,21 +66,19 @@ def test_index_management():
     doc2talk_loaded = Doc2Talk.from_index(test_index_path)
     
     # Verify loaded instance works
-    response = doc2talk_loaded.chat("What is the purpose of this library?")
+    response = await doc2talk_loaded.chat_async("What is the purpose of this library?")
     assert isinstance(response, str)
     assert len(response) > 0
 
 
-def test_session_management():
+@pytest.mark.asyncio
+async def test_session_management(doc2talk):
     """Test session management functionality"""
-    # Create a Doc2Talk instance
-    doc2talk = Doc2Talk(cache_id="test_cache")
-    
     # Get current session ID
     session_id = doc2talk.session_id
     
     # Add a message
-    doc2talk.chat("This is a test message")
+    await doc2talk.chat_async("This is a test message")
     
     # List sessions
     sessions = Doc2Talk.list_sessions()
@@ -0,0 +1,290 @@
+"""
+Test module for the DocGraph knowledge graph (offline, local sources only)
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Barrier
+
+import pytest
+
+from doc2talk.docgraph import Chunker, DocGraph, GitHubResolver, KnowledgeGraph
+
+SAMPLE_CODE = '''
+class Crawler:
+    """Fetches pages and hands them to an extractor"""
+
+    def crawl(self, url):
+        return url
+
+
+class Extractor:
+    def extract(self, html):
+        return html
+'''
+
+SAMPLE_DOCS = """# Guide
+
+## Crawling
+
+Use the Crawler class to crawl a site and collect pages.
+
+## Extraction
+
+The Extractor turns raw html into structured data.
+
+## Installation
+
+Install the package with pip.
+"""
+
+
+@pytest.fixture
+def sources(tmp_path):
+    """Create a small local code + docs tree"""
+    code_dir = tmp_path / "code"
+    docs_dir = tmp_path / "docs"
+    code_dir.mkdir()
+    docs_dir.mkdir()
+    (code_dir / "crawler.py").write_text(SAMPLE_CODE)
+    (docs_dir / "guide.md").write_text(SAMPLE_DOCS)
+    return code_dir, docs_dir
+
+
+def test_bm25_search_ranks_matching_section_first(sources):
+    """The section mentioning the query terms should rank highest"""
+    kb = DocGraph(*map(str, sources))
+
+    results = kb.graph.bm25_search(
+        "install with pip", top_n=2, exclude_types={"class", "function"}
+    )
+
+    assert len(results) == 1
+    assert "Install the package" in kb.graph.nodes[results[0][0]]["content"]
+
+
+def test_bm25_search_respects_exclude_types(sources):
+    """Excluded node types never show up in the results"""
+    kb = DocGraph(*map(str, sources))
+
+    results = kb.graph.bm25_search("extractor", top_n=10, exclude_types={"section"})
+
+    assert results
+    for node_id, score in results:
+        assert kb.graph.nodes[node_id]["meta"]["node_type"] != "section"
+        assert score > 0
+
+
+def test_add_node_after_finalize():
+    """Nodes added after a search are still indexed"""
+    graph = KnowledgeGraph()
+    graph.add_node("alpha beta", {"type": "md", "node_type": "section"})
+    assert len(graph.bm25_search("alpha")) == 1
+
+    graph.add_node("beta gamma", {"type": "md", "node_type": "section"})
+
+    assert len(graph.bm25_search("beta")) == 2
+    assert len(graph.bm25_search("gamma")) == 1
+
+
+def test_persist_and_load_roundtrip(sources, tmp_path):
+    """A loaded graph answers queries exactly like the original"""
+    kb = DocGraph(*map(str, sources))
+    cache_file = tmp_path / "kb.c4ai"
+    kb.persist(cache_file)
+
+    loaded = DocGraph.load(cache_file)
+
+    question = "how does the crawler collect pages"
+    assert loaded.graph.bm25_search(question) == kb.graph.bm25_search(question)
+    assert loaded.query(question) == kb.query(question)
+    assert Path(loaded.code_root) == sources[0]
+
+
+def test_persist_and_load_empty_graph(tmp_path):
+    """Sources without any indexable files still round-trip"""
+    code_dir, docs_dir = tmp_path / "code", tmp_path / "docs"
+    code_dir.mkdir()
+    docs_dir.mkdir()
+    cache_file = tmp_path / "kb.c4ai"
+    DocGraph(str(code_dir), str(docs_dir)).persist(cache_file)
+
+    loaded = DocGraph.load(cache_file)
+
+    assert loaded.graph.bm25_search("anything") == []
+
+
+def test_persist_creates_file_with_default_mode(sources, tmp_path):
+    """The cache gets the same permissions as a file created with open()"""
+    (tmp_path / "reference").touch()
+    cache_file = tmp_path / "kb.c4ai"
+    DocGraph(*map(str, sources)).persist(cache_file)
+
+    assert cache_file.stat().st_mode == (tmp_path / "reference").stat().st_mode
+
+
+def test_load_rejects_truncated_cache(sources, tmp_path):
+    """A cut-off cache file fails in load(), not on a later query"""
+    cache_file = tmp_path / "kb.c4ai"
+    DocGraph(*map(str, sources)).persist(cache_file)
+    data = cache_file.read_bytes()
+    cache_file.write_bytes(data[: len(data) // 2])
+
+    with pytest.raises(ValueError):
+        DocGraph.load(cache_file)
+
+
+def test_update_reparses_only_changed_files(sources, tmp_path, monkeypatch):
+    """update() reuses cached chunks for files whose mtime/size are unchanged"""
+    code_dir, docs_dir = sources
+    (code_dir / "other.py").write_text("def helper():\n    return 1\n")
+    kb = DocGraph(str(code_dir), str(docs_dir))
+    cache_file = tmp_path / "kb.c4ai"
+    kb.persist(cache_file)
+    loaded = DocGraph.load(cache_file)
+
+    # Change one file, then count what gets re-parsed
+    (code_dir / "other.py").write_text("def helper_two():\n    return 2\n")
+    parsed = []
+    chunk_python = Chunker.chunk_python
+
+    def counting_chunk_python(content, path):
+        parsed.append(path)
+        return chunk_python(content, path)
+
+    monkeypatch.setattr(Chunker, "chunk_python", staticmethod(counting_chunk_python))
+    loaded.update()
+
+    assert [Path(p).name for p in parsed] == ["other.py"]
+    assert "helper_two" in loaded.graph.function_registry
+    assert "helper" not in loaded.graph.function_registry
+    assert "crawler" in loaded.graph.class_registry
+
+
+def test_update_keeps_path_of_chunk_shared_by_unchanged_file(sources, tmp_path):
+    """A chunk two files share keeps the unchanged file's path after update()"""
+    code_dir, docs_dir = sources
+    for name in ("a.md", "b.md"):
+        (docs_dir / name).write_text("## Shared\nshared zebra text\n")
+    kb = DocGraph(str(code_dir), str(docs_dir))
+    [(node_id, _)] = kb.graph.bm25_search("zebra")
+    last_writer = Path(kb.graph.nodes[node_id]["meta"]["path"])
+
+    # Change the file whose metadata the shared chunk currently carries
+    last_writer.write_text("## Changed\nsomething else entirely\n")
+    kb.update()
+
+    [(node_id, _)] = kb.graph.bm25_search("zebra")
+    fresh = DocGraph(str(code_dir), str(docs_dir))
+    [(fresh_id, _)] = fresh.graph.bm25_search("zebra")
+    assert kb.graph.nodes[node_id]["meta"] == fresh.graph.nodes[fresh_id]["meta"]
+    assert Path(kb.graph.nodes[node_id]["meta"]["path"]) != last_writer
+
+
+def test_query_appends_related_classes(sources):
+    """Classes mentioned by matching doc sections are appended to the context"""
+    kb = DocGraph(*map(str, sources))
+
+    context = kb.query("how do I crawl a site")
+
+    assert "# Related Classes" in context
+    assert "## Crawler" in context
+
+
+def test_load_decompresses_fields_lazily(sources, tmp_path):
+    """Fields are only decompressed once a query touches them"""
+    kb = DocGraph(*map(str, sources))
+    cache_file = tmp_path / "kb.c4ai"
+    kb.persist(cache_file)
+
+    with DocGraph.load(cache_file) as loaded:
+        assert "node_paths" not in vars(loaded.graph)
+        loaded.query("install with pip")
+        assert "node_paths" in vars(loaded.graph)
+        assert "postings_tfs" not in vars(loaded.graph)
+
+    # Closing loads what was left so the instance stays usable
+    assert loaded.graph.documents == kb.graph.documents
+
+
+def test_lazy_fields_load_once_across_threads(sources, tmp_path):
+    """Threads racing on a deferred field all get the loaded value"""
+    cache_file = tmp_path / "kb.c4ai"
+    DocGraph(*map(str, sources)).persist(cache_file)
+
+    def read_documents(loaded, barrier):
+        barrier.wait()
+        return loaded.graph.documents
+
+    for _ in range(50):
+        loaded = DocGraph.load(cache_file)
+        barrier = Barrier(8)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [
+                executor.submit(read_documents, loaded, barrier) for _ in range(8)
+            ]
+            results = [future.result() for future in futures]
+        assert all(documents is results[0] for documents in results)
+
+
+def test_close_with_outstanding_array_view(sources, tmp_path):
+    """A caller still holding a view of a mapped array does not break close()"""
+    cache_file = tmp_path / "kb.c4ai"
+    DocGraph(*map(str, sources)).persist(cache_file)
+    loaded = DocGraph.load(cache_file)
+    view = loaded.graph.postings_nodes[:10]
+
+    loaded.close()
+
+    assert view.tolist() == loaded.graph.postings_nodes[:10].tolist()
+
+
+def test_bm25_counts_whole_tokens_not_substrings():
+    """A query for "for" must not match "forest" """
+    graph = KnowledgeGraph()
+    graph.add_node("forest forest forest", {"type": "md", "node_type": "section"})
+    loop_id = graph.add_node("a for loop", {"type": "md", "node_type": "section"})
+
+    assert [node_id for node_id, _ in graph.bm25_search("for")] == [loop_id]
+
+
+@pytest.fixture
+def repo_cache(tmp_path, monkeypatch):
+    """Point the GitHub repo cache at an empty directory"""
+    repos_dir = tmp_path / "repos"
+    monkeypatch.setattr(GitHubResolver, "REPOS_DIR", repos_dir)
+    monkeypatch.setattr(GitHubResolver, "INDEX_FILE", repos_dir / "repos.index")
+    return GitHubResolver()
+
+
+def test_repo_cache_evicts_least_recently_used(repo_cache, monkeypatch):
+    """Repos are removed oldest access first until the cache fits its budget"""
+    now = time.time()
+    index = {}
+    for age, name in enumerate(("new", "middle", "old")):
+        (repo_cache.REPOS_DIR / name).mkdir()
+        (repo_cache.REPOS_DIR / name / "data").write_bytes(b"x" * 100)
+        index[name] = [now - age, None]
+    repo_cache._save_index(index)
+    monkeypatch.setattr(GitHubResolver, "MAX_CACHE_BYTES", 250)
+
+    repo_cache._cleanup_old_repos()
+
+    remaining = sorted(p.name for p in repo_cache.REPOS_DIR.iterdir() if p.is_dir())
+    assert remaining == ["middle", "new"]
+    assert repo_cache._load_index()["new"][1] == 100
+
+
+def test_repo_cache_keeps_size_on_unchanged_access(repo_cache):
+    """Only a clone or fetch forces the repo size to be measured again"""
+    repo_dir = repo_cache.REPOS_DIR / "repo"
+    repo_dir.mkdir()
+    (repo_dir / "data").write_bytes(b"x" * 100)
+    repo_cache._cleanup_old_repos()
+
+    repo_cache._update_access_time(repo_dir, changed=False)
+    assert repo_cache._load_index()["repo"][1] == 100
+
+    repo_cache._update_access_time(repo_dir, changed=True)
+    assert repo_cache._load_index()["repo"][1] is None
@@ -1,4 +1,8 @@
+import asyncio
+import hashlib
 import os
+from pathlib import Path
+
 import doc2talk
 from doc2talk import Doc2Talk
 
@@ -6,28 +10,59 @@ __curr_dir = os.path.dirname(os.path.abspath(__file__))
 __parent_dir = os.path.dirname(__curr_dir)
 print(f"Current directory: {__curr_dir}")
 print(f"Parent directory: {__parent_dir}")
+# Probe each candidate directory once
+__curr_has = {name: os.path.exists(f"{__curr_dir}/{name}") for name in ("src", "docs")}
 # Check if the current directory is the root of the project
-if os.path.exists(f"{__curr_dir}/src") and os.path.exists(f"{__curr_dir}/docs"):
-    __parent_dir = __curr_dir
+if all(__curr_has.values()):
+    __parent_dir, __parent_has = __curr_dir, __curr_has
+else:
+    __parent_has = {
+        name: os.path.exists(f"{__parent_dir}/{name}") for name in ("src", "docs")
+    }
+
+code_source = f"{__parent_dir}/src" if __parent_has["src"] else None
+docs_source = f"{__parent_dir}/docs" if __parent_has["docs"] else None
 
-code_source = f"{__parent_dir}/src" if os.path.exists(f"{__parent_dir}/src") else None
-docs_source = f"{__parent_dir}/docs" if os.path.exists(f"{__parent_dir}/docs") else None
+# Key the saved index on the source mtimes so unchanged trees skip the rebuild
+__source_stamps = sorted(
+    f"{p}:{p.stat().st_mtime_ns}"
+    for root in (code_source, docs_source)
+    if root
+    for p in Path(root).rglob("*")
+    if p.suffix in (".py", ".md")
+)
+__index_key = hashlib.sha256("\n".join(__source_stamps).encode()).hexdigest()[:16]
+index_path = Path(__parent_dir) / "tmp" / f"publish-{__index_key}.c4ai"
 
 # Print version
 print(f"doc2talk version: {doc2talk.__version__}")
 
-doc = Doc2Talk(code_source=code_source, docs_source=docs_source)
-print(f"Successfully created Doc2Talk instance with session ID: {doc.session_id}")
 
-print("Building index before chatting...")
-doc.build_index()  # This builds the index without sending any messages
-print("Index built successfully")
+async def main():
+    # One event loop for both the index build and the chat
+    if index_path.exists():
+        print(f"Reusing prebuilt index: {index_path}")
+        doc = Doc2Talk.from_index(index_path)
+        doc.build_index()  # Loads the saved index
+    else:
+        doc = Doc2Talk(code_source=code_source, docs_source=docs_source)
+        print("Building index before chatting...")
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        # Indexes keyed on older source mtimes are never reused
+        for stale in index_path.parent.glob("publish-*.c4ai"):
+            stale.unlink()
+        doc.build_index(save_path=index_path)  # Saved for the next run
+    print(f"Successfully created Doc2Talk instance with session ID: {doc.session_id}")
+    print("Index built successfully")
+
+    question = "How does the Doc2Talk work?"
+    print(f"Question: {question}")
+    response = await doc.chat_async(question)
+    print(f"Response:\n{response}")
+    return response
 
-question = "How does the Doc2Talk work?"
-print(f"Question: {question}")
-response = doc.chat(question)
-print(f"Response:\n{response}")
 
+response = asyncio.run(main())
 
 assert response is not None, "Response should not be None"
 